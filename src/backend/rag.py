@@ -36,7 +36,11 @@ from azure.search.documents.indexes.models import (
     SearchIndexerIndexProjectionsParameters,
     IndexProjectionMode,
     SearchIndexerSkillset,
-    SearchIndexer
+    SearchIndexer,
+    ScalarQuantizationCompression,
+    ScalarQuantizationParameters,
+    RescoringOptions,
+    VectorSearchCompressionRescoreStorageMethod
 
 )
 
@@ -193,8 +197,23 @@ def create_index(index_name, index_client, AZURE_OPENAI_ACCOUNT):
                 name="HnswProfile",
                 algorithm_configuration_name="HnswConfig",
                 vectorizer_name="oaiVectorizer",
+                compression_name="ScalarQuantization",
             )
         ],
+        # Store int8 vectors in the HNSW graph and rescore the oversampled
+        # candidates against the preserved float32 originals to keep recall.
+        # The search tool in src/server/tools/ai_search_tool.py relies on this.
+        compressions=[
+            ScalarQuantizationCompression(
+                compression_name="ScalarQuantization",
+                parameters=ScalarQuantizationParameters(quantized_data_type="int8"),
+                rescoring_options=RescoringOptions(
+                    enable_rescoring=True,
+                    default_oversampling=2,
+                    rescore_storage_method=VectorSearchCompressionRescoreStorageMethod.PRESERVE_ORIGINALS,
+                ),
+            ),
+        ],
         vectorizers=[
             AzureOpenAIVectorizer(
                 vectorizer_name="oaiVectorizer",
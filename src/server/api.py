@@ -1,11 +1,12 @@
 import logging
 import traceback
 import uuid
+from contextlib import asynccontextmanager
 from threading import Lock
 from typing import Any, Dict, List, Optional
 
 import uvicorn
-from agent_framework import AgentExecutorRequest, ChatMessage, Role
+from agent_framework import AgentExecutorRequest, ChatMessage, Role, WorkflowOutputEvent
 from copilotkit import Action as CopilotAction
 from copilotkit import CopilotKitRemoteEndpoint
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
@@ -16,8 +17,9 @@ from pydantic import BaseModel
 from agents.care_navigator_agent import create_care_navigator_agent
 from agents.memory_agent import create_memory_agent
 from settings import AUBREY_SETTINGS
+from tools.ai_search_tool import close_search_clients
 from tools.cosmos_message_store import CosmosDBChatMessageStore
-from workflow import create_workflow, get_chat_client
+from workflow import ConversationWorkflows, create_workflow, get_chat_client, warm_up_chat_clients
 
 # ------------------------------------------------------------------------------------
 # Logging
@@ -33,9 +35,14 @@ if not logger.handlers:
 # Thread + Workflow Caches
 # ------------------------------------------------------------------------------------
 _thread_id_cache: Dict[str, str] = {}
-_workflow_cache: Dict[str, Any] = {}
 _cache_lock = Lock()
 
+# One workflow per conversation key, bounded in number and in concurrent runs.
+_workflows = ConversationWorkflows(
+    max_workflows=AUBREY_SETTINGS.max_cached_workflows,
+    max_concurrent=AUBREY_SETTINGS.max_concurrent_workflows,
+)
+
 
 def get_or_create_thread_id(conversation_key: str = "default") -> str:
     """Return an existing thread ID or create a new one for a conversation key."""
@@ -47,21 +54,11 @@ def get_or_create_thread_id(conversation_key: str = "default") -> str:
         return _thread_id_cache[conversation_key]
 
 
-def get_or_create_workflow() -> Any:
-    """Return a cached workflow (creates if missing)."""
-    with _cache_lock:
-        wf = _workflow_cache.get("workflow")
-        if wf is None:
-            wf = create_workflow()
-            _workflow_cache["workflow"] = wf
-            logger.info("🔄 Created workflow.")
-        return wf
-
-
-# Establish a default workflow/thread for CopilotKit actions
+# Establish a default workflow/thread for CopilotKit actions; building the workflow
+# up front surfaces configuration errors at startup.
 DEFAULT_THREAD_KEY = "aubrey_session_2"
 DEFAULT_THREAD_ID = get_or_create_thread_id(DEFAULT_THREAD_KEY)
-DEFAULT_WORKFLOW = create_workflow()
+_workflows.pin(DEFAULT_THREAD_KEY, create_workflow())
 
 # ------------------------------------------------------------------------------------
 # Request / Response Models
@@ -96,12 +93,18 @@ message_store = CosmosDBChatMessageStore(
 # ------------------------------------------------------------------------------------
 # Output Extraction Helpers
 # ------------------------------------------------------------------------------------
-def extract_output_text(outputs: List[Any]) -> str:
-    """Extract a human-readable response from workflow/agent outputs."""
-    if not outputs:
-        return "No response generated."
+def last_workflow_output(events: List[Any]) -> Optional[Any]:
+    """Return the data of the final output event, scanning from the end."""
+    for event in reversed(events):
+        if isinstance(event, WorkflowOutputEvent):
+            return event.data
+    return None
 
-    output = outputs[-1]
+
+def extract_output_text(output: Optional[Any]) -> str:
+    """Extract a human-readable response from a workflow/agent output."""
+    if output is None:
+        return "No response generated."
 
     # Common cases
     if isinstance(output, str):
@@ -120,8 +123,8 @@ def extract_output_text(outputs: List[Any]) -> str:
     return str(output)
 
 
-async def run_workflow_question(workflow: Any, question: str, context_messages: list[ChatMessage] = None) -> str:
-    """Run a workflow for a single user question and return extracted text."""
+async def run_workflow_question(conversation_key: str, question: str, context_messages: list[ChatMessage] = None) -> str:
+    """Run a conversation's workflow for a single user question and return extracted text."""
     messages = context_messages or []
     messages.append(ChatMessage(Role.USER, text=question))
 
@@ -130,9 +133,9 @@ async def run_workflow_question(workflow: Any, question: str, context_messages:
             messages=messages,
             should_respond=True,
         )
-        events = await workflow.run(request)
-        outputs = events.get_outputs()
-        response_text = extract_output_text(outputs)
+        async with _workflows.acquire(conversation_key) as workflow:
+            events = await workflow.run(request)
+        response_text = extract_output_text(last_workflow_output(events))
         logger.info("🧠 Workflow response (truncated): %s", response_text[:150])
         return response_text
     except Exception as exc:
@@ -149,7 +152,7 @@ async def ask_medical_question_workflow_agent(question: str) -> str:
     """
     logger.info("Received CopilotKit medical question: %s", question)
     user_message = ChatMessage(role=Role.USER, text=question)
-    workflow_response = await run_workflow_question(DEFAULT_WORKFLOW, question)
+    workflow_response = await run_workflow_question(DEFAULT_THREAD_KEY, question)
     system_message = ChatMessage(role=Role.SYSTEM, text=workflow_response)
     await message_store.add_messages([user_message, system_message])
     return workflow_response
@@ -175,11 +178,8 @@ async def get_memory_summary_handler() -> str:
             )
         )
         
-        # Get all messages for this thread
-        messages = await message_store.list_messages()
-
-        # Extract just the text for using in the agent prompt.
-        messages_text = [msg.text for msg in messages]
+        # Extract just the text of this thread's messages for the agent prompt.
+        messages_text = [msg.text async for msg in message_store.iter_messages()]
 
         print(messages_text)
 
@@ -242,7 +242,16 @@ sdk = CopilotKitRemoteEndpoint(actions=[get_user_info_action, medical_question_a
 # ------------------------------------------------------------------------------------
 # FastAPI App Initialization
 # ------------------------------------------------------------------------------------
-app = FastAPI(title="Dr Indigo API")
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Complete the Azure OpenAI handshakes before the first question arrives.
+    await warm_up_chat_clients()
+    yield
+    # Release the shared AI Search connection pool on shutdown.
+    await close_search_clients()
+
+
+app = FastAPI(title="Dr Indigo API", lifespan=lifespan)
 add_fastapi_endpoint(app, sdk, "/copilotkit_remote")
 
 
@@ -303,12 +312,11 @@ async def ask_question_workflow(payload: AskWorkflowRequest) -> AskResponse:
 
     thread_key = payload.thread_key or "copilotkit_session"
     thread_id = get_or_create_thread_id(thread_key)
-    workflow = get_or_create_workflow()
 
     logger.info("Using workflow thread_id=%s for key=%s", thread_id, thread_key)
 
     try:
-        response_text = await run_workflow_question(workflow, question)
+        response_text = await run_workflow_question(thread_key, question)
         return AskResponse(response=response_text)
     except Exception:
         logger.error("Unhandled exception in /ask_workflow endpoint:\n%s", traceback.format_exc())
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import ValidationError
+from pydantic import Field, ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,6 +15,16 @@ class Settings(BaseSettings):
     azure_openai_triage_model: str
     azure_openai_care_nav_model: str
     azure_openai_embedding_model: str
+    # Matryoshka-truncated size for text-embedding-3 models; None keeps the full vector.
+    azure_openai_embedding_dimensions: Optional[int] = 512
+
+    # Workflow Configuration
+    # Runs allowed at once across conversations. Runs within one conversation are
+    # always serialized, and the CopilotKit action always uses DEFAULT_THREAD_KEY,
+    # so this only adds parallelism for /ask_workflow calls with distinct thread_keys.
+    max_concurrent_workflows: int = Field(default=4, ge=1)
+    # Conversations whose workflow (and agent history) is kept; idle ones are evicted LRU.
+    max_cached_workflows: int = Field(default=256, ge=1)
     
     # Azure Authentication (for Cosmos DB AAD/Entra - optional if using key auth)
     azure_tenant_id: Optional[str] = None
@@ -32,6 +42,8 @@ class Settings(BaseSettings):
     search_api_key: Optional[str] = None
     search_endpoint: Optional[str] = None
     search_index_name: Optional[str] = None
+    # Only for indexes with vector compression (see src/backend/rag.py); None disables it.
+    search_vector_oversampling: Optional[float] = None
     
     # Langfuse Configuration (Optional)
     langfuse_secret_key: Optional[str] = None
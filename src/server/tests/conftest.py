@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules under test import each other as top-level packages (``from tools...``).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# settings.py validates required configuration at import; no call leaves the process.
+for _name, _value in {
+    "AZURE_OPENAI_API_KEY": "test-key",
+    "AZURE_OPENAI_ENDPOINT": "https://example.openai.azure.com/",
+    "AZURE_OPENAI_DEPLOYMENT": "test-deployment",
+    "AZURE_OPENAI_TRIAGE_MODEL": "test-triage",
+    "AZURE_OPENAI_CARE_NAV_MODEL": "test-care-nav",
+    "AZURE_OPENAI_EMBEDDING_MODEL": "text-embedding-3-small",
+    "COSMOS_ENDPOINT": "https://example.documents.azure.com:443/",
+    # Keep Chroma from posting usage telemetry during tests.
+    "ANONYMIZED_TELEMETRY": "False",
+}.items():
+    os.environ.setdefault(_name, _value)
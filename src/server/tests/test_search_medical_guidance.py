@@ -0,0 +1,76 @@
+import shutil
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+from tools.search_medical_guidance import MedicalGuidanceSearch, _tokenize
+
+_GUIDE_PATH = (
+    Path(__file__).resolve().parent.parent / "data" / "GuideToTotalJointSurgery_ENG_V2.pdf"
+)
+
+
+class _HashEmbeddingFunction(EmbeddingFunction):
+    """Deterministic, offline stand-in for the Azure OpenAI embedding function."""
+
+    dimensions = 16
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode()) % self.dimensions] += 1.0
+            vector[0] += 1.0
+            vectors.append(vector)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "test-hash"
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config) -> "_HashEmbeddingFunction":
+        return _HashEmbeddingFunction()
+
+
+@pytest.fixture(scope="module")
+def guidance(tmp_path_factory) -> MedicalGuidanceSearch:
+    root = tmp_path_factory.mktemp("guidance")
+    # Copied so the chunk cache is written beside the copy, not into data/.
+    guide_path = root / _GUIDE_PATH.name
+    shutil.copy(_GUIDE_PATH, guide_path)
+    search = MedicalGuidanceSearch(
+        persistent_path=str(root / "chroma"),
+        guide_path=guide_path,
+        embedding_fn=_HashEmbeddingFunction(),
+    )
+    assert search.is_available
+    return search
+
+
+def test_inflections_share_a_stem():
+    assert _tokenize("bathe") == _tokenize("bathing") == _tokenize("baths")
+    assert _tokenize("infected") == _tokenize("infections")
+    assert _tokenize("injury") == _tokenize("injuries")
+
+
+@pytest.mark.parametrize("query", ["bathe", "dislocations", "Are my stairs safe after surgery?"])
+def test_inflected_or_short_queries_reach_the_index(guidance, query):
+    assert guidance.search(query, k=2)
+
+
+def test_clearly_off_topic_query_skips_embedding(guidance):
+    calls = guidance._embedding_fn.calls
+    assert guidance.search("bitcoin futures leverage", k=2) == []
+    assert guidance._embedding_fn.calls == calls
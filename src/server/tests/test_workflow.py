@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+from agent_framework import AgentExecutorResponse, AgentRunResponse, ChatMessage, Role
+
+from agents.medical_triage_agent import MedicalTriageResult
+from workflow import (
+    ConversationWorkflows,
+    _condition_medical_emergency,
+    _is_medical_emergency,
+    _read_emergency_flag,
+)
+
+
+def _triage_response(text: str) -> AgentRunResponse:
+    return AgentRunResponse(messages=[ChatMessage(role=Role.ASSISTANT, text=text)])
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"is_medical_emergency": true, "reason": "chest pain"}', True),
+        ('{"is_medical_emergency": false, "reason": "routine question"}', False),
+        ('{\n  "is_medical_emergency" :\ttrue,\n  "reason": "stroke signs"\n}', True),
+        ('{"reason": "knee stiffness", "is_medical_emergency": false}', False),
+    ],
+)
+def test_reads_boolean_flag(text, expected):
+    assert _read_emergency_flag(_triage_response(text)) is expected
+
+
+def test_string_flag_falls_back_to_model_validation():
+    # Not a JSON boolean, so the regex skips it; pydantic's lax mode accepts "true".
+    text = '{"is_medical_emergency": "true", "reason": "heavy bleeding"}'
+    assert _read_emergency_flag(_triage_response(text)) is True
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"reason": "says \\"is_medical_emergency\\": true", "is_medical_emergency": false}',
+        '{"is_medical_emergency": false, "reason": "\\"is_medical_emergency\\": true"}',
+    ],
+)
+def test_key_quoted_inside_reason_is_ignored(text):
+    assert _read_emergency_flag(_triage_response(text)) is False
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "not json at all",
+        '{"is_medical_emergency": tru',
+        '{"is_medical_emergency": truest, "reason": "x"}',
+        '{"reason": "flag missing"}',
+        '{"is_medical_emergency": "maybe", "reason": "x"}',
+    ],
+)
+def test_malformed_payload_is_not_an_emergency(text):
+    assert _read_emergency_flag(_triage_response(text)) is False
+
+
+def test_typed_value_wins_over_text():
+    response = _triage_response('{"is_medical_emergency": false, "reason": "x"}')
+    response.value = MedicalTriageResult(is_medical_emergency=True, reason="typed")
+    assert _read_emergency_flag(response) is True
+
+
+def test_verdict_is_read_once_per_response():
+    response = AgentExecutorResponse(
+        executor_id="medical_triage_agent_executor",
+        agent_run_response=_triage_response('{"is_medical_emergency": true, "reason": "x"}'),
+    )
+    assert _is_medical_emergency(response) is True
+    # A later change to the text does not alter the cached verdict.
+    response.agent_run_response.messages[0] = ChatMessage(
+        role=Role.ASSISTANT, text='{"is_medical_emergency": false, "reason": "x"}'
+    )
+    assert _condition_medical_emergency(response) is True
+
+
+def test_condition_lets_unexpected_messages_through():
+    assert _condition_medical_emergency("not a response") is True
+
+
+class _FakeWorkflow:
+    """Records how many runs overlap, standing in for a Workflow."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.max_active = 0
+
+    async def run(self, tracker: dict) -> None:
+        self.active += 1
+        tracker["active"] += 1
+        self.max_active = max(self.max_active, self.active)
+        tracker["max_active"] = max(tracker["max_active"], tracker["active"])
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        tracker["active"] -= 1
+
+
+def _run_questions(workflows: ConversationWorkflows, keys: list[str]) -> tuple[list, dict]:
+    tracker = {"active": 0, "max_active": 0}
+
+    async def ask(key: str):
+        async with workflows.acquire(key) as workflow:
+            await workflow.run(tracker)
+            return workflow
+
+    async def main():
+        return await asyncio.gather(*(ask(key) for key in keys))
+
+    return asyncio.run(main()), tracker
+
+
+def test_distinct_conversations_get_separate_workflows_and_run_together():
+    workflows = ConversationWorkflows(_FakeWorkflow, max_workflows=8, max_concurrent=4)
+    (first, second), tracker = _run_questions(workflows, ["alice", "bob"])
+    assert first is not second
+    assert tracker["max_active"] == 2
+    # Follow-ups land on their own conversation's workflow, never the other one.
+    (alice_again,), _ = _run_questions(workflows, ["alice"])
+    (bob_again,), _ = _run_questions(workflows, ["bob"])
+    assert alice_again is first and bob_again is second
+
+
+def test_same_conversation_reuses_its_workflow_one_run_at_a_time():
+    workflows = ConversationWorkflows(_FakeWorkflow, max_workflows=8, max_concurrent=4)
+    results, _ = _run_questions(workflows, ["alice", "alice", "alice"])
+    assert results[0] is results[1] is results[2]
+    assert results[0].max_active == 1
+
+
+def test_concurrency_is_capped_across_conversations():
+    workflows = ConversationWorkflows(_FakeWorkflow, max_workflows=8, max_concurrent=2)
+    _, tracker = _run_questions(workflows, ["a", "b", "c", "d"])
+    assert tracker["max_active"] == 2
+
+
+def test_idle_conversations_are_evicted_but_pinned_ones_are_kept():
+    workflows = ConversationWorkflows(_FakeWorkflow, max_workflows=2, max_concurrent=4)
+    default = _FakeWorkflow()
+    workflows.pin("default", default)
+    for key in ["a", "b", "c"]:
+        _run_questions(workflows, [key])
+    assert len(workflows) == 2
+    assert "default" in workflows and "c" in workflows
+    (again,), _ = _run_questions(workflows, ["default"])
+    assert again is default
+
+
+def test_busy_conversations_are_not_evicted():
+    workflows = ConversationWorkflows(_FakeWorkflow, max_workflows=1, max_concurrent=4)
+    (first, second), _ = _run_questions(workflows, ["a", "b"])
+    assert first is not second
+    # Both ran to completion on their own workflow; only then is the cap enforced.
+    assert len(workflows) == 1
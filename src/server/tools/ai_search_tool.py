@@ -1,7 +1,11 @@
+import asyncio
+import io
 import logging
 
+import aiohttp
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.search.documents.aio import SearchClient
 from azure.search.documents.models import VectorizableTextQuery
 
 from settings import AUBREY_SETTINGS
@@ -9,59 +13,112 @@ from settings import AUBREY_SETTINGS
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# One async client per index, shared by every tool instance so that all searches
+# reuse the same keep-alive connection pool.
+_SEARCH_CLIENTS: dict[str, SearchClient] = {}
+_HTTP_SESSION: aiohttp.ClientSession | None = None
+_CLIENT_LOCK = asyncio.Lock()
+
+_TOP = 5
+_K_NEAREST_NEIGHBORS = 15
+# Upper bound on the text handed back to the agent, keeping its context small.
+_MAX_RESULT_CHARS = 8192
+_RESULT_SEPARATOR = "=================\n"
+
+
+async def _get_search_client(index_name: str) -> SearchClient:
+    """Return the shared SearchClient for an index, creating it on first use."""
+    client = _SEARCH_CLIENTS.get(index_name)
+    if client is not None:
+        return client
+
+    global _HTTP_SESSION
+    async with _CLIENT_LOCK:
+        client = _SEARCH_CLIENTS.get(index_name)
+        if client is None:
+            if _HTTP_SESSION is None or _HTTP_SESSION.closed:
+                _HTTP_SESSION = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60)
+                )
+            client = SearchClient(
+                endpoint=AUBREY_SETTINGS.search_endpoint,
+                index_name=index_name,
+                credential=AzureKeyCredential(AUBREY_SETTINGS.search_api_key),
+                transport=AioHttpTransport(session=_HTTP_SESSION, session_owner=False),
+            )
+            _SEARCH_CLIENTS[index_name] = client
+        return client
+
+
+async def close_search_clients() -> None:
+    """Close the shared search clients and their HTTP session."""
+    global _HTTP_SESSION
+    async with _CLIENT_LOCK:
+        for client in _SEARCH_CLIENTS.values():
+            await client.close()
+        _SEARCH_CLIENTS.clear()
+        if _HTTP_SESSION is not None:
+            await _HTTP_SESSION.close()
+            _HTTP_SESSION = None
+
 
 def create_search_tool(index_name: str = None):
     """
     Factory function that creates a search tool.
 
+    The vector query asks for only a few more neighbours than it returns.
+    ``oversampling`` is sent only when SEARCH_VECTOR_OVERSAMPLING is set, since
+    the service rejects it on indexes without vector compression; enable it once
+    the index uses the scalar-quantized profile defined in ``src/backend/rag.py``.
+
     Args:
         index_name: Optional search index name (defaults to env var SEARCH_INDEX_NAME)
 
     Returns:
-        A search_tool function that takes a query string and returns search results
+        An async search_tool function that takes a query string and returns search results
     """
-    # Create search client once when the tool is created
     search_index = index_name or AUBREY_SETTINGS.search_index_name
-    search_client = SearchClient(
-        endpoint=AUBREY_SETTINGS.search_endpoint,
-        index_name=search_index,
-        credential=AzureKeyCredential(AUBREY_SETTINGS.search_api_key)
-    )
 
-    def search_tool(query: str) -> str:
+    async def search_tool(query: str) -> str:
         """Search the knowledge base for relevant information."""
-        logger.info(f"🔍 AI Search Tool called with query: {query[:100]}...")
-        print(f"🔍 AI Search Tool called with query: {query[:100]}...")
-        
+        logger.info("🔍 AI Search Tool called with query: %s...", query[:100])
+
         try:
+            search_client = await _get_search_client(search_index)
+
             vector_query = VectorizableTextQuery(
-                text=query, 
-                k_nearest_neighbors=50, 
-                fields="text_vector"
+                text=query,
+                k_nearest_neighbors=_K_NEAREST_NEIGHBORS,
+                fields="text_vector",
+                oversampling=AUBREY_SETTINGS.search_vector_oversampling,
             )
 
-            results = search_client.search(
+            results = await search_client.search(
                 search_text=query,
                 vector_queries=[vector_query],
                 select=["title", "chunk"],
-                top=5,
+                search_fields=["chunk"],
+                top=_TOP,
             )
 
-            sources = [
-                f"TITLE: {doc['title']}, CONTENT: {doc['chunk']}"
-                for doc in results
-            ]
+            buffer = io.StringIO()
+            source_count = 0
+            async for doc in results:
+                if source_count:
+                    buffer.write(_RESULT_SEPARATOR)
+                buffer.write(f"TITLE: {doc['title']}, CONTENT: {doc['chunk']}")
+                source_count += 1
+                if buffer.tell() >= _MAX_RESULT_CHARS:
+                    break
+
+            result_text = buffer.getvalue()[:_MAX_RESULT_CHARS] if source_count else "No relevant information found in the knowledge base."
+
+            logger.info("✅ AI Search Tool returned %d results", source_count)
 
-            result_text = "=================\n".join(sources) if sources else "No relevant information found in the knowledge base."
-            
-            logger.info(f"✅ AI Search Tool returned {len(sources)} results")
-            print(f"✅ AI Search Tool returned {len(sources)} results")
-            
             return result_text
 
         except Exception as e:
-            logger.error(f"⛔ Error performing search: {e}")
-            print(f"⛔ Error performing search: {e}")
+            logger.error("⛔ Error performing search: %s", e)
             return f"Error performing search: {e}"
 
     return search_tool
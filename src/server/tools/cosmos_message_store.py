@@ -5,7 +5,8 @@ This store persists agent chat history in Cosmos DB, enabling memory to be
 shared across multiple agents and maintained per user/thread.
 """
 
-from collections.abc import Sequence
+import logging
+from collections.abc import AsyncIterator, Sequence
 from typing import Any
 from uuid import uuid4
 
@@ -13,6 +14,14 @@ from agent_framework import ChatMessage
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
+# Container partition key definition; every document carries its thread_id.
+_PARTITION_KEY = PartitionKey(path="/thread_id")
+
+# Number of documents fetched per round trip when reading a thread's history.
+_QUERY_PAGE_SIZE = 64
+
 
 class CosmosStoreState(BaseModel):
     """State model for serializing and deserializing Cosmos DB chat message store data."""
@@ -76,22 +85,26 @@ class CosmosDBChatMessageStore:
     def _initialize_cosmos(self) -> None:
         """Create database and container if they don't exist."""
         try:
-            print(f"🔌 Connecting to Cosmos DB: {self.cosmos_endpoint}")
+            logger.info("🔌 Connecting to Cosmos DB: %s", self.cosmos_endpoint)
             
             # Create database if it doesn't exist
             self._database = self._client.create_database_if_not_exists(id=self.database_name)
-            print(f"✅ Connected to database: {self.database_name}")
+            logger.info("✅ Connected to database: %s", self.database_name)
 
             # Create container if it doesn't exist, partitioned by thread_id
             # Note: For serverless accounts, don't specify offer_throughput or autopilot
             self._container = self._database.create_container_if_not_exists(
                 id=self.container_name,
-                partition_key=PartitionKey(path="/thread_id"),
+                partition_key=_PARTITION_KEY,
+            )
+            logger.info(
+                "✅ Connected to container: %s (thread_id: %s)",
+                self.container_name,
+                self.thread_id,
             )
-            print(f"✅ Connected to container: {self.container_name} (thread_id: {self.thread_id})")
             
         except Exception as e:
-            print(f"❌ Failed to connect to Cosmos DB: {e}")
+            logger.error("❌ Failed to connect to Cosmos DB: %s", e)
             raise
 
     async def add_messages(self, messages: Sequence[ChatMessage]) -> None:
@@ -103,11 +116,15 @@ class CosmosDBChatMessageStore:
         if not messages:
             return
 
-        print(f"💾 Adding {len(messages)} message(s) to Cosmos DB memory (thread_id: {self.thread_id})")
-        
+        logger.debug(
+            "💾 Adding %d message(s) to Cosmos DB memory (thread_id: %s)",
+            len(messages),
+            self.thread_id,
+        )
+
         try:
             # Add each message as a document in Cosmos DB
-            for i, message in enumerate(messages, 1):
+            for message in messages:
                 message_dict = message.to_dict()
                 document = {
                     "id": str(uuid4()),  # Unique document ID
@@ -116,53 +133,62 @@ class CosmosDBChatMessageStore:
                     "timestamp": message_dict.get("timestamp"),
                 }
                 self._container.create_item(body=document)
-                print(f"  ✓ Saved message {i}/{len(messages)} (role: {message.role})")
 
-            print(f"✅ Successfully saved {len(messages)} message(s) to memory")
+            logger.debug("✅ Successfully saved %d message(s) to memory", len(messages))
 
             # Apply message limit if configured
             if self.max_messages is not None:
                 await self._trim_messages()
                 
         except Exception as e:
-            print(f"❌ Failed to save messages to Cosmos DB: {e}")
+            logger.error("❌ Failed to save messages to Cosmos DB: %s", e)
             raise
 
+    async def iter_messages(self) -> AsyncIterator[ChatMessage]:
+        """Yield messages from the store in chronological order.
+
+        Documents are read page by page and only their ``message`` field is
+        fetched, so memory stays flat however long the thread grows.
+
+        Yields:
+            ChatMessage objects in chronological order (oldest first).
+        """
+        query = """
+            SELECT c.message FROM c
+            WHERE c.thread_id = @thread_id
+            ORDER BY c._ts ASC
+        """
+        parameters = [{"name": "@thread_id", "value": self.thread_id}]
+
+        pages = self._container.query_items(
+            query=query,
+            parameters=parameters,
+            partition_key=self.thread_id,
+            max_item_count=_QUERY_PAGE_SIZE,
+        ).by_page()
+
+        for page in pages:
+            for item in page:
+                message_data = item.get("message")
+                if message_data:
+                    yield ChatMessage.from_dict(message_data)
+
     async def list_messages(self) -> list[ChatMessage]:
         """Get all messages from the store in chronological order.
 
         Returns:
             List of ChatMessage objects in chronological order (oldest first).
         """
-        print(f"📖 Retrieving messages from Cosmos DB memory (thread_id: {self.thread_id})")
-        
+        logger.debug(
+            "📖 Retrieving messages from Cosmos DB memory (thread_id: %s)",
+            self.thread_id,
+        )
+
         try:
-            # Query all messages for this thread, ordered by timestamp
-            query = """
-                SELECT * FROM c 
-                WHERE c.thread_id = @thread_id 
-                ORDER BY c._ts ASC
-            """
-            parameters = [{"name": "@thread_id", "value": self.thread_id}]
-
-            items = list(
-                self._container.query_items(
-                    query=query,
-                    parameters=parameters,
-                    enable_cross_partition_query=False,
-                    partition_key=self.thread_id,
-                )
-            )
+            messages = [message async for message in self.iter_messages()]
 
-            messages: list[ChatMessage] = []
-            for item in items:
-                message_data = item.get("message")
-                if message_data:
-                    message = ChatMessage.from_dict(message_data)
-                    messages.append(message)
+            logger.debug("✅ Retrieved %d message(s) from memory", len(messages))
 
-            print(f"✅ Retrieved {len(messages)} message(s) from memory")
-            
             def _preview(msg: ChatMessage) -> str:
                 # Prefer .text; fall back to .contents if present
                 if hasattr(msg, "text") and isinstance(msg.text, str):
@@ -172,14 +198,15 @@ class CosmosDBChatMessageStore:
                     return combined[:50]
                 return ""
             
-            if messages:
-                print(f"  First message: {messages[0].role} - {_preview(messages[0])}...")
-                print(f"  Last message: {messages[-1].role} - {_preview(messages[-1])}...")
+            # Building previews touches every content part; only do it when shown.
+            if messages and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  First message: %s - %s...", messages[0].role, _preview(messages[0]))
+                logger.debug("  Last message: %s - %s...", messages[-1].role, _preview(messages[-1]))
 
             return messages
             
         except Exception as e:
-            print(f"❌ Failed to retrieve messages from Cosmos DB: {e}")
+            logger.error("❌ Failed to retrieve messages from Cosmos DB: %s", e)
             raise
 
     async def _trim_messages(self) -> None:
@@ -199,7 +226,6 @@ class CosmosDBChatMessageStore:
             self._container.query_items(
                 query=query,
                 parameters=parameters,
-                enable_cross_partition_query=False,
                 partition_key=self.thread_id,
             )
         )
@@ -207,8 +233,12 @@ class CosmosDBChatMessageStore:
         # Delete oldest messages if we exceed the limit
         if len(items) > self.max_messages:
             messages_to_delete = items[: len(items) - self.max_messages]
-            print(f"🗑️  Trimming {len(messages_to_delete)} old message(s) (max: {self.max_messages})")
-            
+            logger.debug(
+                "🗑️  Trimming %d old message(s) (max: %s)",
+                len(messages_to_delete),
+                self.max_messages,
+            )
+
             for item in messages_to_delete:
                 try:
                     self._container.delete_item(
@@ -218,7 +248,7 @@ class CosmosDBChatMessageStore:
                     # Message already deleted, skip
                     pass
 
-            print(f"✅ Trimmed messages, now at {self.max_messages} messages")
+            logger.debug("✅ Trimmed messages, now at %s messages", self.max_messages)
 
     async def serialize_state(self, **kwargs: Any) -> Any:
         """Serialize the current store state for persistence.
@@ -278,7 +308,6 @@ class CosmosDBChatMessageStore:
             self._container.query_items(
                 query=query,
                 parameters=parameters,
-                enable_cross_partition_query=False,
                 partition_key=self.thread_id,
             )
         )
@@ -1,6 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import itertools
 import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
 from typing import Annotated, Any
 
 import chromadb
@@ -24,10 +32,16 @@ _DEFAULT_GUIDE_PATH = (
     / "data"
     / "GuideToTotalJointSurgery_ENG_V2.pdf"
 )
+# Embedded guide chunks persist here so warm starts skip re-embedding the PDF.
+_DEFAULT_CHROMA_PATH = Path(__file__).resolve().parent.parent / "data" / ".chroma_medical"
+_COLLECTION_NAME = "medical_guidance"
 _METADATA_SOURCE = "Your Guide to Total Joint Replacement"
+_GUIDE_SIGNATURE_KEY = "guide_signature"
 
 
-def _load_embedding_function() -> embedding_functions.OpenAIEmbeddingFunction | None:
+@functools.lru_cache(maxsize=1)
+def _get_embedding_function() -> embedding_functions.OpenAIEmbeddingFunction | None:
+    """Build the shared embedding function on first use rather than at import."""
     try:
         return embedding_functions.OpenAIEmbeddingFunction(
             model_name=AUBREY_SETTINGS.azure_openai_embedding_model,
@@ -36,6 +50,7 @@ def _load_embedding_function() -> embedding_functions.OpenAIEmbeddingFunction |
             api_type="azure",
             api_base=AUBREY_SETTINGS.azure_openai_endpoint,
             api_version=AUBREY_SETTINGS.azure_openai_api_version,
+            dimensions=AUBREY_SETTINGS.azure_openai_embedding_dimensions,
         )
     except Exception as exc:  # pragma: no cover - defensive logging only
         logger.warning(
@@ -45,10 +60,77 @@ def _load_embedding_function() -> embedding_functions.OpenAIEmbeddingFunction |
         return None
 
 
-_EMBEDDING_FN = _load_embedding_function()
+# Roughly 400/40 tokens of English prose (about four characters per token).
+_MAX_CHUNK_CHARS = 1600
+_MAX_CHUNK_OVERLAP = 160
+_QUERY_EMBEDDING_CACHE_SIZE = 1024
+_QUERY_RESULT_CACHE_SIZE = 256
+# Azure OpenAI accepts up to 2048 inputs per embeddings request.
+_EMBED_BATCH_SIZE = 2048
+_ADD_BATCH_SIZE = 500
+# Bump when the chunk format or splitting strategy changes.
+_CHUNK_CACHE_VERSION = 2
+
+# The guide is English; ASCII word matching skips the Unicode category tables.
+_TOKEN_PATTERN = re.compile(r"\w+", re.ASCII)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+# Longest first: "bathe", "baths" and "bathing" all reduce to "bath".
+_STEM_SUFFIXES = (
+    "ations", "ation", "ating", "ated", "ates", "ate", "ings", "ing", "ions",
+    "ion", "ies", "ied", "es", "ed", "s", "e", "y",
+)
+_MIN_STEM_CHARS = 3
+# Queries with fewer content terms than this are searched even without a
+# vocabulary hit: a lone unfamiliar word is more likely a synonym than off-topic.
+_MIN_TERMS_TO_SKIP = 3
+# Words too common to tell whether a query is about anything in the guide.
+_STOP_WORDS = frozenset(
+    {
+        "a", "about", "after", "am", "an", "and", "any", "are", "as", "at", "be",
+        "before", "can", "do", "does", "for", "from", "how", "i", "if", "in",
+        "is", "it", "me", "my", "of", "on", "or", "should", "so", "that", "the",
+        "this", "to", "what", "when", "where", "which", "who", "why", "will",
+        "with", "you", "your",
+    }
+)
+
+
+def _stem(token: str) -> str:
+    """Strip one common English suffix so inflections of a word compare equal."""
+    for suffix in _STEM_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM_CHARS:
+            return token[: -len(suffix)]
+    return token
+
+
+def _tokenize(text: str) -> set[str]:
+    """Return the lowercased, lightly stemmed content words of ``text``."""
+    return {
+        _stem(token)
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in _STOP_WORDS
+    }
+
 
-_MAX_CHUNK_CHARS = 900
-_MAX_CHUNK_OVERLAP = 90
+def _normalize_query(query: str) -> str:
+    """Fold case and whitespace so trivially different phrasings share cache entries."""
+    return _WHITESPACE_PATTERN.sub(" ", query.strip().lower())
+
+
+def _guide_signature(guide_path: Path) -> str | None:
+    """Identify a guide revision by its size and mtime, or None if it is missing."""
+    try:
+        stat = guide_path.stat()
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _build_vocabulary(docs: list[str]) -> frozenset[str]:
+    vocabulary: set[str] = set()
+    for doc in docs:
+        vocabulary.update(_tokenize(doc))
+    return frozenset(vocabulary)
 
 
 class GuidanceMatch(BaseModel):
@@ -80,6 +162,51 @@ def load_pdf_chunks(
     return text_splitter.split_documents(pages)
 
 
+def load_pdf_chunks_cached(
+    guide_path: Path,
+    *,
+    chunk_size: int = _MAX_CHUNK_CHARS,
+    chunk_overlap: int = _MAX_CHUNK_OVERLAP,
+) -> list[Document]:
+    """Return the guide's chunks, reusing a pickle next to the PDF when it is current.
+
+    The cache file starts with a header of the PDF's size and mtime plus the
+    splitter settings; any mismatch falls back to parsing and rewrites it.
+    """
+    stat = guide_path.stat()
+    header = (stat.st_size, stat.st_mtime_ns, chunk_size, chunk_overlap)
+    cache_path = guide_path.with_name(
+        f"{guide_path.stem}.chunks.pkl.v{_CHUNK_CACHE_VERSION}"
+    )
+
+    try:
+        with cache_path.open("rb") as cache_file:
+            if pickle.load(cache_file) == header:
+                return pickle.load(cache_file)
+    except FileNotFoundError:
+        pass
+    except Exception as exc:  # pragma: no cover - defensive logging only
+        logger.warning("Ignoring unreadable guidance chunk cache %s: %s", cache_path, exc)
+
+    chunks = load_pdf_chunks(
+        guide_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+    try:
+        # Write to a temporary file first so concurrent workers never read a
+        # partially written cache.
+        with tempfile.NamedTemporaryFile(
+            dir=cache_path.parent, suffix=".tmp", delete=False
+        ) as tmp_file:
+            pickle.dump(header, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(chunks, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file.name, cache_path)
+    except OSError as exc:
+        logger.warning("Could not write guidance chunk cache %s: %s", cache_path, exc)
+
+    return chunks
+
+
 class MedicalGuidanceSearch:
     """Encapsulates the logic for searching medical guidance."""
 
@@ -87,14 +214,25 @@ class MedicalGuidanceSearch:
 
     def __init__(
         self,
-        persistent_path: str | None = None,
+        persistent_path: str | None = str(_DEFAULT_CHROMA_PATH),
         guide_path: Path | str | None = None,
         embedding_fn: embedding_functions.OpenAIEmbeddingFunction | None = None,
     ) -> None:
         self._persistent_path = persistent_path
         self._guide_path = Path(guide_path) if guide_path else _DEFAULT_GUIDE_PATH
-        self._embedding_fn = embedding_fn or _EMBEDDING_FN
+        self._embedding_fn = embedding_fn or _get_embedding_function()
         self._collection: chromadb.Collection | None = None
+        # Content words of the indexed guide, used to skip clearly off-topic queries.
+        self._vocabulary: frozenset[str] = frozenset()
+        # Patients often repeat the same question within a session. Caching the
+        # results skips the whole lookup on a repeat, and caching the query
+        # vector still saves the embedding round-trip when only top_k differs.
+        self._embed_query = functools.lru_cache(maxsize=_QUERY_EMBEDDING_CACHE_SIZE)(
+            self._embed_query_uncached
+        )
+        self._query_collection = functools.lru_cache(maxsize=_QUERY_RESULT_CACHE_SIZE)(
+            self._query_collection_uncached
+        )
 
         if self._embedding_fn is None:
             logger.warning(
@@ -108,13 +246,34 @@ class MedicalGuidanceSearch:
         """Initializes the ChromaDB collection, building it if necessary."""
         client = self._create_client()
 
+        # Vectors of different sizes cannot share a collection, and chunks split
+        # at another size would mix with the new ones, so a persisted store built
+        # with other settings is left alone rather than reused.
+        dimensions = getattr(self._embedding_fn, "dimensions", None)
+        name = f"{_COLLECTION_NAME}_{_MAX_CHUNK_CHARS}c"
+        if dimensions:
+            name = f"{name}_{dimensions}d"
         collection = client.get_or_create_collection(
-            name="medical_guidance",
+            name=name,
             embedding_function=self._embedding_fn,
         )
 
+        # The stored guide signature ties the vectors to the PDF they came from;
+        # if the guide cannot be read, keep serving whatever was indexed.
+        signature = _guide_signature(self._guide_path)
         if collection.count() > 0:
-            return collection
+            stored_signature = (collection.metadata or {}).get(_GUIDE_SIGNATURE_KEY)
+            if signature is None or stored_signature == signature:
+                stored = collection.get(include=["documents"])
+                self._vocabulary = _build_vocabulary(stored.get("documents") or [])
+                return collection
+
+            logger.info("Medical guidance PDF changed; rebuilding collection %s", name)
+            client.delete_collection(name)
+            collection = client.create_collection(
+                name=name,
+                embedding_function=self._embedding_fn,
+            )
 
         chunks = self._load_chunks()
         if not chunks:
@@ -131,6 +290,11 @@ class MedicalGuidanceSearch:
             logger.warning("Failed to ingest guidance documents: %s", exc)
             return None
 
+        if signature is not None:
+            # Recorded only after a complete ingest so a partial build is redone.
+            collection.modify(metadata={_GUIDE_SIGNATURE_KEY: signature})
+
+        self._vocabulary = _build_vocabulary(docs)
         return collection
 
     def _create_client(self):
@@ -140,7 +304,7 @@ class MedicalGuidanceSearch:
 
     def _load_chunks(self) -> list[Document]:
         try:
-            return load_pdf_chunks(self._guide_path)
+            return load_pdf_chunks_cached(self._guide_path)
         except FileNotFoundError:
             logger.warning(
                 "Medical guidance PDF not found at %s; search will be unavailable.",
@@ -177,7 +341,26 @@ class MedicalGuidanceSearch:
         metadatas: list[dict[str, Any]] | None = None,
     ) -> None:
         ids = [f"doc_{i}" for i in range(len(docs))]
-        collection.add(documents=docs, metadatas=metadatas, ids=ids)
+
+        # Embed up front in as few requests as possible, then hand Chroma the
+        # vectors so it does not call the embedding function itself.
+        embeddings: list[Any] = []
+        for start in range(0, len(docs), _EMBED_BATCH_SIZE):
+            embeddings.extend(
+                self._embedding_fn(input=docs[start : start + _EMBED_BATCH_SIZE])
+            )
+
+        for start in range(0, len(docs), _ADD_BATCH_SIZE):
+            stop = start + _ADD_BATCH_SIZE
+            collection.add(
+                ids=ids[start:stop],
+                documents=docs[start:stop],
+                metadatas=metadatas[start:stop] if metadatas else None,
+                embeddings=embeddings[start:stop],
+            )
+
+    def _embed_query_uncached(self, query: str) -> Any:
+        return self._embedding_fn(input=[query])[0]
 
     @property
     def is_available(self) -> bool:
@@ -189,36 +372,64 @@ class MedicalGuidanceSearch:
             logger.info("Medical guidance search requested but no index is loaded.")
             return []
 
+        normalized_query = _normalize_query(query)
+        terms = _tokenize(normalized_query)
+        if (
+            self._vocabulary
+            and len(terms) >= _MIN_TERMS_TO_SKIP
+            and self._vocabulary.isdisjoint(terms)
+        ):
+            logger.info("Skipping guidance search; no query terms appear in the guide.")
+            return []
+
         k = k if k is not None else self._DEFAULT_TOP_K
-        res = self._collection.query(query_texts=[query], n_results=max(k, 1))
+        return list(self._query_collection(normalized_query, max(k, 1)))
+
+    def _query_collection_uncached(self, query: str, k: int) -> tuple[GuidanceMatch, ...]:
+        query_embedding = self._embed_query(query)
+        res = self._collection.query(query_embeddings=[query_embedding], n_results=k)
 
         documents = res.get("documents", [[]])[0]
         if not documents:
-            return []
+            return ()
 
         metadatas = res.get("metadatas", [[]])[0]
         distances = res.get("distances", [[]])[0]
 
-        matches: list[GuidanceMatch] = []
-        for idx, text in enumerate(documents):
-            metadata = metadatas[idx] if metadatas and idx < len(metadatas) else None
-            distance = (
-                float(distances[idx]) if distances and idx < len(distances) else -1.0
+        # Chroma returns parallel columns; missing ones are padded rather than
+        # bounds-checked per row.
+        return tuple(
+            GuidanceMatch(
+                text=text,
+                metadata=metadata,
+                distance=float(distance) if distance is not None else -1.0,
             )
-            matches.append(
-                GuidanceMatch(
-                    text=text,
-                    metadata=metadata,
-                    distance=distance,
-                )
+            for text, metadata, distance in itertools.zip_longest(
+                documents, metadatas or (), distances or ()
             )
-
-        return matches
+        )
 
 
 # --- Global Instance ---
 
-_search_instance = MedicalGuidanceSearch()
+
+_search_instance: MedicalGuidanceSearch | None = None
+_SEARCH_INSTANCE_LOCK = threading.Lock()
+
+
+def _get_search_instance() -> MedicalGuidanceSearch:
+    """Create the shared search instance the first time the tool is used.
+
+    Building it loads the guide and may embed it, so importing this module
+    (for example in every forked API worker) must not do so eagerly. The tool
+    calls this from a worker thread; the lock keeps concurrent first calls from
+    building the index twice.
+    """
+    global _search_instance
+    with _SEARCH_INSTANCE_LOCK:
+        if _search_instance is None:
+            _search_instance = MedicalGuidanceSearch()
+        return _search_instance
 
 
 @ai_function(
@@ -249,13 +460,22 @@ async def search_medical_guidance(
             message="The search query was empty. Please provide a question or keywords.",
         ).model_dump()
 
-    if _search_instance is None or not _search_instance.is_available:
+    if not _tokenize(query):
+        return GuidanceSearchResult(
+            matches=[],
+            message="The search query was too vague. Please include specific keywords.",
+        ).model_dump()
+
+    # The first call parses and may embed the guide; keep that off the event loop too.
+    search_instance = await asyncio.to_thread(_get_search_instance)
+    if not search_instance.is_available:
         return GuidanceSearchResult(
             matches=[],
             message="The medical guidance search service is not available.",
         ).model_dump()
 
-    matches = _search_instance.search(query, k=top_k)
+    # Chroma's query is synchronous (HNSW plus sqlite reads); run it off the event loop.
+    matches = await asyncio.to_thread(search_instance.search, query, k=top_k)
     if not matches:
         logger.info("No matches found for query='%s'", query)
         return GuidanceSearchResult(
@@ -268,8 +488,6 @@ async def search_medical_guidance(
 
 
 if __name__ == "__main__":
-    import asyncio
-
     async def main():
         query = "What are the risks of total joint replacement surgery?"
         result = await search_medical_guidance(query=query, top_k=3)
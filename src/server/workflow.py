@@ -1,8 +1,15 @@
-from typing import Any, Never
+import asyncio
+import logging
+import re
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Never
 
 from agent_framework import (
     AgentExecutorRequest,
     AgentExecutorResponse,
+    AgentRunResponse,
     Workflow,
     WorkflowBuilder,
     WorkflowContext,
@@ -17,28 +24,95 @@ from agents.medical_triage_agent import (
 )
 from settings import AUBREY_SETTINGS
 
+logger = logging.getLogger(__name__)
+
 _CLIENT_CACHE: dict[
     tuple[str | None, str | None, str | None], AzureOpenAIChatClient
 ] = {}
+# get_chat_client is synchronous (it runs while the workflow is built at import),
+# so a threading lock rather than an asyncio one keeps client creation single-flight.
+_CLIENT_CACHE_LOCK = threading.Lock()
+# Bounds start-up when the endpoint is slow or unreachable.
+_WARMUP_TIMEOUT_SECONDS = 5.0
 
 
 _TRIAGE_EXECUTOR_ID = "medical_triage_agent_executor"
 _CARE_NAV_EXECUTOR_ID = "care_navigator_agent_executor"
 
+# The emergency edge and the fan-in router both inspect the same triage response;
+# the verdict is stashed on it so the JSON is read only once.
+_EMERGENCY_FLAG_ATTR = "_cached_is_medical_emergency"
+# Scans the raw triage JSON for the flag without tokenizing the rest of the payload.
+_EMERGENCY_FLAG_PATTERN = re.compile(r'"is_medical_emergency"\s*:\s*(true|false)\b')
+
 
 def get_chat_client(api_key: str | None, endpoint: str | None, deployment: str | None) -> AzureOpenAIChatClient:
     cache_key = (api_key, endpoint, deployment)
     client = _CLIENT_CACHE.get(cache_key)
-    if client is None:
-        client = AzureOpenAIChatClient(
-            api_key=api_key,
-            endpoint=endpoint,
-            deployment_name=deployment,
-        )
-        _CLIENT_CACHE[cache_key] = client
+    if client is not None:
+        return client
+
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(cache_key)
+        if client is None:
+            client = AzureOpenAIChatClient(
+                api_key=api_key,
+                endpoint=endpoint,
+                deployment_name=deployment,
+            )
+            _CLIENT_CACHE[cache_key] = client
     return client
 
 
+async def warm_up_chat_clients() -> None:
+    """Open a connection for every cached chat client before traffic arrives.
+
+    The clients are created with the workflow at import, outside any event loop,
+    so this is awaited from the API's startup hook instead.
+    """
+    await asyncio.gather(*(_warm_up_client(client) for client in list(_CLIENT_CACHE.values())))
+
+
+async def _warm_up_client(client: AzureOpenAIChatClient) -> None:
+    # A cheap GET completes DNS + TLS; any reply, even an error status, leaves the
+    # connection in the pool for the first agent call.
+    openai_client = getattr(client, "client", None)
+    if openai_client is None:
+        return
+    try:
+        await asyncio.wait_for(openai_client.models.list(), _WARMUP_TIMEOUT_SECONDS)
+    except Exception as exc:  # pragma: no cover - defensive logging only
+        logger.debug("Chat client warm-up failed: %s", exc)
+
+
+def _read_emergency_flag(agent_run_response: AgentRunResponse) -> bool:
+    if isinstance(agent_run_response.value, MedicalTriageResult):
+        return agent_run_response.value.is_medical_emergency
+
+    text = agent_run_response.text
+    match = _EMERGENCY_FLAG_PATTERN.search(text)
+    if match is not None:
+        return match.group(1) == "true"
+
+    # The flag is absent or not a JSON boolean; let the model decide (or fail).
+    try:
+        # Using model_validate_json ensures type safety and raises if the shape is wrong.
+        return MedicalTriageResult.model_validate_json(text).is_medical_emergency
+    except Exception:
+        return False
+
+
+def _is_medical_emergency(response: AgentExecutorResponse) -> bool:
+    """Return whether the triage response flags an emergency, reading it at most once.
+
+    Responses that cannot be parsed count as non-emergencies (fail closed).
+    """
+    cache = response.__dict__
+    if _EMERGENCY_FLAG_ATTR not in cache:
+        cache[_EMERGENCY_FLAG_ATTR] = _read_emergency_flag(response.agent_run_response)
+    return cache[_EMERGENCY_FLAG_ATTR]
+
+
 @executor(id="entry_dispatcher")
 async def _entry_dispatcher(
     request: AgentExecutorRequest, ctx: WorkflowContext[AgentExecutorRequest]
@@ -61,31 +135,15 @@ async def _final_response_router(
 ) -> None:
     """Emit the care navigator reply when the triage agent clears the emergency check."""
 
-    triage_response: AgentExecutorResponse | None = None
-    care_nav_response: AgentExecutorResponse | None = None
-
-    for response in responses:
-        if response.executor_id == _TRIAGE_EXECUTOR_ID:
-            triage_response = response
-        elif response.executor_id == _CARE_NAV_EXECUTOR_ID:
-            care_nav_response = response
+    by_id = {response.executor_id: response for response in responses}
+    triage_response = by_id.get(_TRIAGE_EXECUTOR_ID)
+    care_nav_response = by_id.get(_CARE_NAV_EXECUTOR_ID)
 
     if triage_response is None or care_nav_response is None:
         # Require both responses before deciding on the final output.
         return
 
-    triage_result: MedicalTriageResult | None = None
-    if isinstance(triage_response.agent_run_response.value, MedicalTriageResult):
-        triage_result = triage_response.agent_run_response.value
-    else:
-        try:
-            triage_result = MedicalTriageResult.model_validate_json(
-                triage_response.agent_run_response.text
-            )
-        except Exception:
-            triage_result = None
-
-    if triage_result and triage_result.is_medical_emergency:
+    if _is_medical_emergency(triage_response):
         # Emergency messaging already emitted via the dedicated handler.
         return
 
@@ -99,16 +157,9 @@ def _condition_medical_emergency(message: Any) -> bool:
     # Defensive guard. If a non AgentExecutorResponse appears, let the edge pass to avoid dead ends.
     if not isinstance(message, AgentExecutorResponse):
         return True
-    try:
-        # Using model_validate_json ensures type safety and raises if the shape is wrong.
-        detection = MedicalTriageResult.model_validate_json(
-            message.agent_run_response.text
-        )
-        return detection.is_medical_emergency
-    except Exception:
-        # Fail closed on parse errors so we do not accidentally route to the wrong path.
-        # Returning False prevents this edge from activating.
-        return False
+    # Fail closed on parse errors so we do not accidentally route to the wrong path.
+    # Returning False prevents this edge from activating.
+    return _is_medical_emergency(message)
 
 
 def create_workflow() -> Workflow:
@@ -148,3 +199,85 @@ def create_workflow() -> Workflow:
         )
         .build()
     )
+
+
+class _ConversationEntry:
+    __slots__ = ("lock", "workflow", "users")
+
+    def __init__(self, workflow: Workflow | None = None) -> None:
+        self.lock = asyncio.Lock()
+        self.workflow = workflow
+        # Callers holding or waiting on the lock; only idle entries are evicted.
+        self.users = 0
+
+
+class ConversationWorkflows:
+    """Per-conversation workflows with bounded memory and bounded concurrency.
+
+    Each conversation key gets its own workflow, whose agent executors carry that
+    conversation's history between runs. A Workflow rejects concurrent runs, so
+    runs on one key are serialized by a per-key lock, while a semaphore caps runs
+    across all keys. At most ``max_workflows`` entries are kept; the least
+    recently used idle, unpinned entries are evicted along with their locks.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Workflow] = create_workflow,
+        *,
+        max_workflows: int,
+        max_concurrent: int,
+    ) -> None:
+        self._factory = factory
+        self._max_workflows = max_workflows
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._entries: OrderedDict[str, _ConversationEntry] = OrderedDict()
+        self._pinned: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, conversation_key: str) -> bool:
+        return conversation_key in self._entries
+
+    def pin(self, conversation_key: str, workflow: Workflow | None = None) -> None:
+        """Keep a conversation's workflow for the life of the process."""
+        entry = self._entries.get(conversation_key)
+        if entry is None:
+            entry = self._entries[conversation_key] = _ConversationEntry(workflow)
+        elif workflow is not None and entry.workflow is None:
+            entry.workflow = workflow
+        self._pinned.add(conversation_key)
+
+    @asynccontextmanager
+    async def acquire(self, conversation_key: str) -> AsyncIterator[Workflow]:
+        """Hold a conversation's workflow (creating it if missing) for one run."""
+        entry = self._entries.get(conversation_key)
+        if entry is None:
+            entry = self._entries[conversation_key] = _ConversationEntry()
+        self._entries.move_to_end(conversation_key)
+        entry.users += 1
+        try:
+            async with entry.lock:
+                if entry.workflow is None:
+                    entry.workflow = self._factory()
+                    logger.info("🔄 Created workflow for key=%s", conversation_key)
+                async with self._semaphore:
+                    yield entry.workflow
+        finally:
+            entry.users -= 1
+            self._evict_idle()
+
+    def _evict_idle(self) -> None:
+        # Busy entries are skipped, so the cache may briefly exceed its cap while
+        # more than max_workflows conversations are in flight.
+        excess = len(self._entries) - self._max_workflows
+        if excess <= 0:
+            return
+        for key in [
+            key
+            for key, entry in self._entries.items()
+            if entry.users == 0 and key not in self._pinned
+        ][:excess]:
+            del self._entries[key]
+            logger.info("🧹 Evicted idle workflow for key=%s", key)